@@ -11,6 +11,14 @@ from utils import ExperimentParser
 
 
 SIZE = 300
+# Transforms are stateless so are built once rather than for every split
+TRAIN_TRANSFORM = albumentations.Compose([
+    albumentations.Flip(),
+    albumentations.PadIfNeeded(336, 512)
+])
+TEST_TRANSFORM = albumentations.Compose([
+    albumentations.PadIfNeeded(336, 512)
+])
 
 
 def produce_output(model=None, path=None, padding=16, batch_size=8, device='cpu'):
@@ -61,8 +69,12 @@ def main():
     parser.add_argument('--full',
                         default=False, action='store_true',
                         help='Whether to run full test list. (default: %(default)s)')
-    args = parser.parse_args()
     net_args, training_args = parser.parse_group_args()
+    args = parser.args
+
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
 
     device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
     if args.produce:
@@ -77,23 +89,22 @@ def main():
             splits = get_splits(SIZE, max(6, training_args.nsplits))
         for split_no, split in zip(range(training_args.nsplits), splits):
             trainloader, validloader = bsd(
-                transform=albumentations.Compose([
-                    albumentations.Flip(),
-                    albumentations.PadIfNeeded(336, 512)
-                ]),
+                transform=TRAIN_TRANSFORM,
                 split=split,
-                num_workers=4,
+                num_workers=training_args.num_workers,
                 batch_size=training_args.batch_size
             )
             eval_loader = bsd(
-                transform=albumentations.Compose([
-                    albumentations.PadIfNeeded(336, 512)
-                ]),
+                transform=TEST_TRANSFORM,
                 split=split,
-                num_workers=4,
+                num_workers=training_args.num_workers,
                 batch_size=training_args.batch_size,
                 test=True
             )
+            # quicktorch doesn't expose pin_memory, but DataLoader reads it
+            # afresh for every iterator
+            for loader in (trainloader, validloader, eval_loader):
+                loader.pin_memory = torch.cuda.is_available()
 
             if net_args.cmplx:
                 Net = UNetIGCNCmplx
@@ -104,6 +115,9 @@ def main():
                 n_classes=1,
                 save_dir='models/seg/bsd',
                 name=('bsd_' + parser.args_to_str(net_args)) + '_epoch87',
+                channels_last=training_args.channels_last,
+                amp=training_args.amp,
+                compile=training_args.compile,
                 **vars(net_args)
             ).to(device)
 
@@ -149,7 +163,6 @@ def main():
             temp_metrics = evaluate(model, eval_loader, device=device)
             m['accuracy'] = temp_metrics['accuracy']
             del(model)
-            torch.cuda.empty_cache()
             metrics.append(m)
 
         mean_m = {key: sum(mi[key] for mi in metrics) / training_args.nsplits for key in m.keys()}
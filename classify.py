@@ -169,7 +169,6 @@ def run_exp(net_args, training_args, device='0', **kwargs):
             m['precision'] = temp_metrics['precision']
             m['recall'] = temp_metrics['recall']
         del(model)
-        torch.cuda.empty_cache()
         metrics.append(m)
 
     mean_m = {key: sum(mi[key] for mi in metrics) / training_args.nsplits for key in m.keys()}
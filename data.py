@@ -12,6 +12,14 @@ from quicktorch.utils import imshow
 import matplotlib.pyplot as plt
 
 
+def load_image(path):
+    """Opens and fully decodes an image, rather than leaving it lazily loaded.
+    """
+    img = Image.open(path)
+    img.load()
+    return img
+
+
 class CirrusDataset(Dataset):
     """Loads cirrus dataset from file.
 
@@ -21,9 +29,12 @@ class CirrusDataset(Dataset):
             be applied to the data.
         target_transform (Trasform, optional): Transform(s) to
             be applied to the targets.
+        cache (bool, optional): Whether to keep decoded images in memory
+            after they are first read. Each worker process keeps its own
+            copy of the whole set. Defaults to False.
     """
     def __init__(self, img_dir, indices=None, denoise=False,
-                 transform=None, target_transform=None):
+                 transform=None, target_transform=None, cache=False):
         self.cirrus_paths = [
             img for img in glob.glob(os.path.join(img_dir, 'input/*.png'))
         ]
@@ -39,24 +50,39 @@ class CirrusDataset(Dataset):
         self.num_classes = 2
         self.transform = transform
         self.target_transform = target_transform
+        self.cache = {} if cache else None
 
         if indices is not None:
             self.cirrus_paths = [self.cirrus_paths[i] for i in indices]
             self.mask_paths = [self.mask_paths[i] for i in indices]
 
     def __getitem__(self, i):
-        cirrus = transforms.ToTensor()(
-            Image.open(self.cirrus_paths[i])
-        )
-        mask = transforms.ToTensor()(
-            Image.open(self.mask_paths[i])
-        )
+        cirrus, mask = self.load(i)
+        cirrus = transforms.ToTensor()(cirrus)
+        mask = transforms.ToTensor()(mask)
         if self.transform is not None:
             cirrus = self.transform(cirrus)
         if self.target_transform is not None:
             mask = self.target_transform(mask)
         return cirrus, mask
 
+    def load(self, i):
+        """Reads and decodes image i and its mask, or fetches them from the
+        cache if they have been read before.
+
+        The cached images are never modified, as each call converts them to
+        new tensors before any transform is applied.
+        """
+        if self.cache is not None and i in self.cache:
+            return self.cache[i]
+        imgs = (
+            load_image(self.cirrus_paths[i]),
+            load_image(self.mask_paths[i])
+        )
+        if self.cache is not None:
+            self.cache[i] = imgs
+        return imgs
+
     def __len__(self):
         return len(self.cirrus_paths)
 
@@ -70,9 +96,13 @@ class EMDataset(Dataset):
             be applied to the data.
         target_transform (Trasform, optional): Transform(s) to
             be applied to the targets.
+        cache (bool, optional): Whether to keep decoded images in memory
+            after they are first read. Each worker process keeps its own
+            copy of the whole set. Defaults to False.
     """
     def __init__(self, img_dir,
-                 transform=None, target_transform=None, aug_mult=4, indices=None):
+                 transform=None, target_transform=None, aug_mult=4, indices=None,
+                 cache=False):
         self.em_paths = [
             img for img in glob.glob(os.path.join(img_dir, 'volume/*.png'))
         ]
@@ -86,18 +116,14 @@ class EMDataset(Dataset):
 
         self.transform = transform
         self.aug_mult = aug_mult
+        self.cache = {} if cache else None
         if indices is not None:
             self.em_paths = [self.em_paths[i] for i in indices]
             if not self.test:
                 self.mask_paths = [self.mask_paths[i] for i in indices]
 
     def __getitem__(self, i):
-        i = i // self.aug_mult
-        em = np.array(Image.open(self.em_paths[i]))
-        if self.test:
-            mask = np.zeros_like(em)
-        else:
-            mask = np.array(Image.open(self.mask_paths[i]))
+        em, mask = self.load(i // self.aug_mult)
 
         if self.transform is not None:
             t = self.transform(image=em, mask=mask)
@@ -110,6 +136,29 @@ class EMDataset(Dataset):
             transforms.ToTensor()(mask)
         )
 
+    def load(self, i):
+        """Reads and decodes image i and its mask, or fetches them from the
+        cache if they have been read before.
+
+        Each image is used aug_mult times per epoch, so caching saves
+        decoding it repeatedly even within an epoch.
+        """
+        if self.cache is not None and i in self.cache:
+            em, mask = self.cache[i]
+            # Transforms may work in place, so only ever see copies
+            return em.copy(), mask.copy()
+        em = np.array(Image.open(self.em_paths[i]))
+        if self.test:
+            mask = np.zeros_like(em)
+        else:
+            mask = np.array(Image.open(self.mask_paths[i]))
+        if self.cache is not None:
+            em.setflags(write=False)
+            mask.setflags(write=False)
+            self.cache[i] = (em, mask)
+            return em.copy(), mask.copy()
+        return em, mask
+
     def __len__(self):
         return len(self.em_paths) * self.aug_mult
 
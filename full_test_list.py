@@ -26,6 +26,7 @@ def main():
     metrics = []
     models = []
     device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    loaders = {}
 
     for dset in dsets:
         for model_name in names:
@@ -34,13 +35,26 @@ def main():
                     for inter_mg, final_mg in mgs:
                             m = run_exp(dset, model_name, no_g,
                                         rot_pool, inter_mg, final_mg,
-                                        no_epochs, device)
+                                        no_epochs, device, loaders)
                             metrics.append(m)
                             models.append(dset + "_" + model_name)
+    torch.cuda.empty_cache()
 
     print(metrics, models)
 
 
+def pin_loaders(*loaders, prefetch_factor=4):
+    """Enables pinned memory on loaders built by quicktorch.data.
+
+    The quicktorch constructors don't expose these DataLoader options, but
+    both are read afresh each time an iterator is created.
+    """
+    for loader in loaders:
+        loader.pin_memory = torch.cuda.is_available()
+        if loader.num_workers > 0:
+            loader.prefetch_factor = prefetch_factor
+
+
 def write_results(dset, model_name, no_g, m, no_epochs,
                   total_params, mins, secs, rot_pool=False,
                   inter_mg=False, final_mg=False, cmplx=False):
@@ -62,7 +76,35 @@ def write_results(dset, model_name, no_g, m, no_epochs,
     f.close()
 
 
-def run_exp(dset, model_name, no_g, rot_pool, inter_mg, final_mg, no_epochs, device):
+def load_data(dset, b_size):
+    """Builds the train, test and (for mnistrot) evaluation loaders.
+    """
+    eval_loader = None
+    if dset == 'mnist':
+        train_loader, test_loader, _ = mnist(batch_size=b_size,
+                                             rotate=True,
+                                             num_workers=8)
+    if dset == 'mnistrot':
+        train_loader, test_loader, _ = mnistrot(batch_size=b_size,
+                                                num_workers=8)
+        eval_loader, _ = mnistrot(batch_size=b_size,
+                                  num_workers=8,
+                                  test=True)
+    if dset == 'cifar':
+        train_loader, test_loader, _ = cifar(batch_size=b_size)
+    pin_loaders(*(loader for loader in (train_loader, test_loader, eval_loader)
+                  if loader is not None))
+    return train_loader, test_loader, eval_loader
+
+
+def run_exp(dset, model_name, no_g, rot_pool, inter_mg, final_mg, no_epochs,
+            device, loaders=None):
+    """Trains and evaluates a single IGCN configuration.
+
+    Args:
+        loaders (dict, optional): Cache of loaders keyed by (dset, b_size),
+            shared across calls so that a sweep builds each loader once.
+    """
     print("Training igcn{} on {} with rot_pool={}, no_g={}, "
           "inter_mg={}, final_mg={}".format(model_name, dset, rot_pool,
                                             no_g, inter_mg, final_mg))
@@ -76,20 +118,21 @@ def run_exp(dset, model_name, no_g, rot_pool, inter_mg, final_mg, no_epochs, dev
             b_size = 4096
         if cmplx:
             b_size //= 4
-        if dset == 'mnist':
-            train_loader, test_loader, _ = mnist(batch_size=b_size,
-                                                 rotate=True,
-                                                 num_workers=8)
-        if dset == 'mnistrot':
-            train_loader, test_loader, _ = mnistrot(batch_size=b_size,
-                                                    num_workers=8)
-
     if dset == 'cifar':
-        train_loader, test_loader, _ = cifar(batch_size=2048)
+        b_size = 2048
 
+    if loaders is None:
+        loaders = {}
+    if (dset, b_size) not in loaders:
+        loaders[(dset, b_size)] = load_data(dset, b_size)
+    train_loader, test_loader, eval_loader = loaders[(dset, b_size)]
+
+    # bf16 autocast raises on GPUs without bf16 support (pre-Ampere)
+    amp = device.type == 'cuda' and torch.cuda.is_bf16_supported()
     model = IGCN(no_g=no_g, model_name=model_name, dset=dset,
                  rot_pool=rot_pool, inter_mg=inter_mg,
-                 final_mg=final_mg, cmplx=cmplx, one=one).to(device)
+                 final_mg=final_mg, cmplx=cmplx, one=one,
+                 channels_last=True, amp=amp).to(device)
 
     total_params = sum(p.numel()
                        for p in model.parameters() if p.requires_grad)
@@ -109,12 +152,10 @@ def run_exp(dset, model_name, no_g, rot_pool, inter_mg, final_mg, no_epochs, dev
     mins = int(time_taken // 60)
     secs = int(time_taken % 60)
 
-    if dset == 'mnistrot':
-        eval_loader, _ = mnistrot(batch_size=b_size,
-                                  num_workers=8,
-                                  test=True)
+    if eval_loader is not None:
         print('Evaluating')
-        temp_metrics = evaluate(model, eval_loader, device=device)
+        with torch.inference_mode():
+            temp_metrics = evaluate(model, eval_loader, device=device)
         m['accuracy'] = temp_metrics['accuracy']
         m['precision'] = temp_metrics['precision']
         m['recall'] = temp_metrics['recall']
@@ -124,7 +165,6 @@ def run_exp(dset, model_name, no_g, rot_pool, inter_mg, final_mg, no_epochs, dev
                   inter_mg=inter_mg, final_mg=final_mg, cmplx=cmplx)
 
     del(model)
-    torch.cuda.empty_cache()
 
     return m
 
@@ -183,6 +223,10 @@ if __name__ == "__main__":
                         help='Number of samples in each batch.')
     args = parser.parse_args()
 
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+
     if args.full:
         main()
     else:
@@ -1,5 +1,4 @@
 import math
-import numpy as np
 import torch
 import torch.nn.functional as F
 import torch.nn.init as init
@@ -15,8 +14,14 @@ def cmplx(real, imag):
 
 def new_cmplx(real):
     """Creates a trivial complex tensor.
+
+    Writes straight into a single allocation rather than stacking real with
+    a separately allocated zero tensor. The memory format of real is kept.
     """
-    return cmplx(real, torch.zeros_like(real))
+    x = torch.empty_like(real.unsqueeze(0).expand(2, *real.size()))
+    x[0].copy_(real)
+    x[1].zero_()
+    return x
 
 
 def magnitude(x, eps=1e-8, sq=False, **kwargs):
@@ -44,29 +49,65 @@ def concatenate(x, **kwargs):
     return torch.cat([x[0], x[1]], dim=1)
 
 
-def conv_cmplx(x, w, transpose=False, **kwargs):
+def _is_channels_last(t):
+    """Checks whether a 4D tensor is strictly in channels last format.
+    """
+    return (
+        t.dim() == 4
+        and not t.is_contiguous()
+        and t.is_contiguous(memory_format=torch.channels_last)
+    )
+
+
+def conv_cmplx(x, w, transpose=False, w_sum=None, **kwargs):
     """Computes complex convolution.
+
+    Uses Gauss's trick so that only three real convolutions are required:
+        a = w_re * x_re, b = w_im * x_im, c = (w_re + w_im) * (x_re + x_im)
+        out = (a - b) + i(c - a - b)
+
+    Args:
+        w (torch.Tensor or tuple): Complex weight, either stacked or as a
+            (real, imag) pair.
+        w_sum (torch.Tensor, optional): Precomputed w[0] + w[1]. Computed here
+            if not given.
     """
+    real, imag = x[0], x[1]
+    if _is_channels_last(w[0]) and not _is_channels_last(real):
+        # Convert once here rather than inside each of the three convs
+        real = real.contiguous(memory_format=torch.channels_last)
+        imag = imag.contiguous(memory_format=torch.channels_last)
+
     conv = F.conv2d
     if transpose:
         conv = F.conv_transpose2d
-        w = w.transpose(1, 2)
+        w = [c.transpose(0, 1) for c in w]
+        if w_sum is not None:
+            w_sum = w_sum.transpose(0, 1)
+    if w_sum is None:
+        w_sum = w[0] + w[1]
 
-    real = conv(x[0, ...], w[0, ...], **kwargs) - conv(x[1, ...], w[1, ...], **kwargs)
-    imag = conv(x[0, ...], w[1, ...], **kwargs) + conv(x[1, ...], w[0, ...], **kwargs)
+    a = conv(real, w[0], **kwargs)
+    b = conv(imag, w[1], **kwargs)
+    c = conv(real + imag, w_sum, **kwargs)
 
-    return cmplx(real, imag)
+    return cmplx(a - b, c - a - b)
 
 
 def linear_cmplx(x, w, b=None, transpose=False, **kwargs):
     """Computes complex linear transformation
+
+    Uses the same three product form as conv_cmplx.
     """
     linear = F.linear
     if transpose:
         pass
 
-    real = linear(x[0, ...], w[0, ...]) - linear(x[1, ...], w[1, ...])
-    imag = linear(x[0, ...], w[1, ...]) + linear(x[1, ...], w[0, ...])
+    re_re = linear(x[0], w[0])
+    im_im = linear(x[1], w[1])
+    summed = linear(x[0] + x[1], w[0] + w[1])
+    real = re_re - im_im
+    imag = summed - re_re - im_im
 
     if b is not None:
         real = real - b[0]
@@ -77,25 +118,47 @@ def linear_cmplx(x, w, b=None, transpose=False, **kwargs):
 
 def relu_cmplx_z(x, inplace=False, eps=1e-12, **kwargs):
     """Computes complex relu.
+
+    inplace is only honoured when grad is disabled.
     """
-    x = torch.where(x[0] > 0, x, torch.zeros_like(x))
-    x = torch.where(x[1] > 0, x, torch.zeros_like(x))
-    return x
+    mask = (x[0] > 0) & (x[1] > 0)
+    if inplace and not torch.is_grad_enabled():
+        return x.mul_(mask)
+    return x * mask
 
 
 def relu_cmplx_mod(x, b=1e-8, inplace=False, **kwargs):
     """Computes complex relu.
+
+    The scale relu(|x| + b) / |x| is formed from a single rsqrt of the
+    squared magnitude, avoiding a sqrt and a full-tensor division.
+
+    Under half precision the magnitude is taken in float32, as the eps clamp
+    would otherwise underflow to zero.
+
+    inplace is only honoured when grad is disabled, as the product's
+    backward needs the unscaled input.
     """
-    r = magnitude(x, sq=False)
-    if r.dim() < b.dim():
+    half = x.dtype in (torch.float16, torch.bfloat16)
+    r2 = magnitude(x.float() if half else x, sq=True).clamp(min=1e-8)
+    inv_r = torch.rsqrt(r2)
+    if r2.dim() < b.dim():
         b = b.flatten(0)
-    return F.relu(r + b) * x / r
+    scale = F.relu(r2 * inv_r + b) * inv_r
+    if half:
+        scale = scale.to(x.dtype)
+    if inplace and not torch.is_grad_enabled():
+        return x.mul_(scale)
+    return x * scale
 
 
 def relu_cmplx(x, inplace=False, **kwargs):
     """Computes complex relu.
+
+    Both components are rectified independently, which for the stacked
+    layout is a plain relu over the whole tensor.
     """
-    return cmplx(F.relu(x[0]), F.relu(x[1]))
+    return F.relu(x, inplace=inplace)
 
 
 def bnorm_cmplx_old(x, eps=1e-8):
@@ -112,6 +175,9 @@ def bnorm_cmplx_old(x, eps=1e-8):
 
 def pool_cmplx(x, kernel_size, operator='max', **kwargs):
     """Computes complex pooling.
+
+    Both components are pooled in a single call by folding the complex axis
+    into the batch axis, which is a view for the stacked layout.
     """
     pool = F.max_pool2d
     if operator == 'avg' or operator == 'average':
@@ -119,38 +185,43 @@ def pool_cmplx(x, kernel_size, operator='max', **kwargs):
     if operator == 'mag':
         return max_mag_pool(x, kernel_size, **kwargs)
 
-    return cmplx(
-        pool(x[0], kernel_size, **kwargs),
-        pool(x[1], kernel_size, **kwargs)
-    )
+    out = pool(x.flatten(0, 1), kernel_size, **kwargs)
+    return out.unflatten(0, (2, -1))
 
 
 def max_mag_pool(x, kernel_size, **kwargs):
     """Computes max magnitude pooling on complex tensors.
+
+    Squared magnitude is used for selection as it has the same argmax.
     """
-    r = magnitude(x)
+    r = magnitude(x.detach(), sq=True)
     _, idxs = F.max_pool2d(r, kernel_size, return_indices=True, **kwargs)
-    cmplx_idxs = cmplx(idxs, idxs)
-    max_by_mags = x.flatten(start_dim=3).gather(dim=3, index=cmplx_idxs.flatten(start_dim=3))
-    return max_by_mags.view_as(cmplx_idxs)
+    flat_idxs = idxs.flatten(start_dim=2).expand(2, *idxs.shape[:2], -1)
+    out = x.flatten(start_dim=3).gather(dim=3, index=flat_idxs)
+    return out.view(2, *idxs.shape)
 
 
 def max_mag_gabor_pool(x, **kwargs):
     """Computes max magnitude pooling over gabor axis.
     """
-    r = magnitude(x)
+    r = magnitude(x.detach(), sq=True)
     _, idxs = torch.max(r, dim=2, keepdim=True)
-    idxs = idxs.unsqueeze(0).repeat(2, 1, 1, 1, 1, 1)
-    return x.gather(dim=3, index=idxs).squeeze(3), idxs
+    return cmplx(
+        x[0].gather(dim=2, index=idxs).squeeze(2),
+        x[1].gather(dim=2, index=idxs).squeeze(2)
+    ), idxs
 
 
 def max_summed_mag_gabor_pool(x, **kwargs):
     """Computes max summed magnitude pooling over gabor axis.
     """
-    r_summed = magnitude(x).sum(dim=(-1, -2), keepdim=True)
+    r_summed = magnitude(x.detach()).sum(dim=(-1, -2), keepdim=True)
     _, idxs = torch.max(r_summed, dim=2, keepdim=True)
-    idxs = idxs.unsqueeze(0).repeat(2, 1, 1, 1, x.size(-2), x.size(-1))
-    return x.gather(dim=3, index=idxs).squeeze(3), idxs
+    idxs = idxs.expand(-1, -1, -1, x.size(-2), x.size(-1))
+    return cmplx(
+        x[0].gather(dim=2, index=idxs).squeeze(2),
+        x[1].gather(dim=2, index=idxs).squeeze(2)
+    ), idxs
 
 
 def init_weights(re, im, mode='he', polar=False):
@@ -163,13 +234,13 @@ def init_weights(re, im, mode='he', polar=False):
     if mode == 'glorot':
         sigma = 1 / (fan_in + fan_out)
 
-    mag = re.new_tensor(np.random.rayleigh(scale=sigma, size=re.size()))
-    phase = re.new_tensor(np.random.uniform(low=-np.pi, high=np.pi, size=re.size()))
-
     with torch.no_grad():
+        # Rayleigh(sigma) sampled as sigma * sqrt(2 * Exp(1)), on re's device
+        mag = torch.empty_like(re).exponential_().mul_(2 * sigma ** 2).sqrt_()
+        phase = torch.empty_like(re).uniform_(-math.pi, math.pi)
         if polar:
-            re.data = mag
-            im.data = phase
+            re.copy_(mag)
+            im.copy_(phase)
         else:
-            re.data = mag * torch.cos(phase)
-            im.data = mag * torch.sin(phase)
+            re.copy_(mag * torch.cos(phase))
+            im.copy_(mag * torch.sin(phase))
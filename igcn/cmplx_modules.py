@@ -21,13 +21,32 @@ from .cmplx import (
     bnorm_cmplx_old,
     magnitude,
     phase,
-    concatenate
+    concatenate,
+    new_cmplx
 )
 
 
 log = logging.getLogger(__name__)
 
 
+def _weight_key(*weights):
+    """Identifies the current state of some weights.
+
+    Changes whenever a weight is modified in place (e.g. by an optimiser step
+    or load_state_dict) or moved to new storage (e.g. by .to()).
+    """
+    return tuple((w.data_ptr(), w._version) for w in weights)
+
+
+def _use_weight_cache():
+    """Whether derived weights should be cached, i.e. gradients are disabled.
+
+    Never under torch.compile, where the data pointer checks would break the
+    graph and the weights are cheap to recompute inside it.
+    """
+    return not torch.is_grad_enabled() and not torch.compiler.is_compiling()
+
+
 class IGaborCmplx(nn.Module):
     """Wraps the complex Gabor implementation into a NN layer w/o convolution.
 
@@ -47,20 +66,66 @@ class IGaborCmplx(nn.Module):
         self.no_g = no_g
         self.register_buffer("gabor_filters", torch.Tensor(2, self.no_g, 1, 1,
                                                            *kernel_size))
+        # Holds the modulated weights when gradients are disabled
+        self.register_buffer("enhanced", None, persistent=False)
         self.layer = layer
         self.calc_filters = True  # Flag whether filter bank needs recalculating
-        self.register_backward_hook(self.set_filter_calc)
+        self.gabor_params.register_hook(self.set_filter_calc)
 
     def forward(self, x):
-        log.debug(f'x.size()={x.unsqueeze(1).size()}, gabor={gabor_cmplx(x, self.gabor_params).unsqueeze(2).size()}')
-        if self.calc_filters:
-            self.generate_gabor_filters(x)
-        out = self.gabor_filters * x.unsqueeze(1)
-        out = out.view(2, -1 , *out.size()[3:])
-        log.debug(f'out.size()={out.size()}')
-        if self.layer:
-            out = out.view(x.size(0), x.size(1) * self.no_g, *x.size()[2:])
-        return out
+        """Modulates x by the filter bank.
+
+        x may also be given as a (real, imag) pair of weights, in which case
+        a pair is returned and the components are never stacked.
+        """
+        self.update_filters()
+        if not torch.is_tensor(x):
+            return self.modulate_pair(*x)
+        if not _use_weight_cache():
+            out = self.gabor_filters * x.unsqueeze(1)
+        else:
+            out = self.modulate_inplace(x[0], x[1])
+        # Folds the gabor axis into the next, which already gives the layer
+        # output shape (2, no_g * x.size(1), ...)
+        return out.reshape(2, -1, *x.size()[2:])
+
+    def modulate_pair(self, real, imag):
+        """Modulates the real and imaginary components separately.
+        """
+        if not _use_weight_cache():
+            out = (self.gabor_filters[0] * real, self.gabor_filters[1] * imag)
+        else:
+            out = self.modulate_inplace(real, imag)
+        return tuple(o.reshape(-1, *o.size()[2:]) for o in out)
+
+    def modulate_inplace(self, real, imag):
+        """Modulates the components by the filter bank, writing into a reused
+        buffer.
+
+        Only valid when gradients are disabled, and not used under
+        torch.compile where the buffer checks would break the graph. The
+        returned tensor is overwritten by the next call.
+        """
+        size = (2, self.no_g, *real.size())
+        # An inference tensor can't be written to outside inference mode,
+        # so the buffer is also replaced when switching between the two
+        if (self.enhanced is None or self.enhanced.size() != size
+                or self.enhanced.dtype != real.dtype
+                or self.enhanced.device != real.device
+                or self.enhanced.is_inference() != torch.is_inference_mode_enabled()):
+            self.enhanced = real.new_empty(size)
+        torch.mul(self.gabor_filters[0], real, out=self.enhanced[0])
+        torch.mul(self.gabor_filters[1], imag, out=self.enhanced[1])
+        return self.enhanced
+
+    def update_filters(self):
+        """Regenerates the filter bank if it is stale.
+
+        Can be called ahead of forward, e.g. so that a checkpointed block sees
+        the same bank when it is recomputed.
+        """
+        if self.calc_filters or self.filters_lack_grad():
+            self.generate_gabor_filters(self.gabor_filters)
 
     def generate_gabor_filters(self, x):
         """Generates the gabor filter bank
@@ -68,11 +133,40 @@ class IGaborCmplx(nn.Module):
         self.gabor_filters = gabor_cmplx(x, self.gabor_params).unsqueeze(2)
         self.calc_filters = False
 
-    def set_filter_calc(self, *args):
-        """Called in backward hook so that filter bank will be regenerated.
+    def filters_lack_grad(self):
+        """Whether the filter bank was generated with gradients disabled but
+        gradients are now needed, e.g. after a validation pass.
+        """
+        return (
+            torch.is_grad_enabled()
+            and self.gabor_params.requires_grad
+            and not self.gabor_filters.requires_grad
+        )
+
+    def refresh(self):
+        """Forces the filter bank to be regenerated on the next forward.
         """
         self.calc_filters = True
 
+    def train(self, mode=True):
+        self.refresh()
+        return super().train(mode)
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        # Tensor hooks are dropped by deepcopy and pickling, so the copy
+        # re-registers its own
+        self.gabor_params.register_hook(self.set_filter_calc)
+        self.refresh()
+
+    def set_filter_calc(self, *args):
+        """Called by gabor_params' grad hook so the filter bank will be regenerated.
+
+        The bank is then rebuilt at most once per backward, i.e. once per
+        optimiser step, and a bank whose graph has been freed is never reused.
+        """
+        self.refresh()
+
 
 class IGConvCmplx(nn.Module):
     """Implements a convolutional layer where weights are first Gabor modulated.
@@ -121,33 +215,43 @@ class IGConvCmplx(nn.Module):
         self.gabor_pooling = gabor_pooling
         self.include_gparams = include_gparams
         self.conv_kwargs = conv_kwargs
+        self._weight_cache = None
 
     def forward(self, x):
-        enhanced_weight = self.gabor(cmplx(self.ReConv.weight, self.ImConv.weight))
-        out = self.conv(x, enhanced_weight, **self.conv_kwargs)
+        enhanced_weight, weight_sum = self.cmplx_weight()
+        out = self.conv(x, enhanced_weight, w_sum=weight_sum, **self.conv_kwargs)
 
         if self.gabor_pooling is None:
             return out
 
         pool_out = out.view(2,
                             out.size(1),
-                            enhanced_weight.size(1) // self.no_g,
+                            enhanced_weight[0].size(0) // self.no_g,
                             self.no_g,
                             out.size(3),
                             out.size(4))
 
-        pool_out, max_idxs = self.gabor_pooling(pool_out, dim=3)
-        out = pool_out
-
+        pool_out, _ = self.gabor_pooling(pool_out, dim=3)
+        return pool_out
 
-        # if self.include_gparams:
-            # if self.gabor_pooling == 'max':
-            #     out = pool_out
-            # if self.include_gparams:
-            #     max_gparams = self.gabor.gabor_params[0, max_idxs]
-            #     out = torch.stack(out, max_gparams, dim=3)
+    def cmplx_weight(self):
+        """Returns the Gabor modulated weight and the sum of its components.
 
-        return out
+        When gradients are disabled both are cached until the weights change.
+        """
+        use_cache = _use_weight_cache()
+        if not use_cache:
+            self._weight_cache = None
+        else:
+            key = _weight_key(self.ReConv.weight, self.ImConv.weight,
+                              self.gabor.gabor_params)
+            if self._weight_cache is not None and self._weight_cache[0] == key:
+                return self._weight_cache[1]
+        enhanced_weight = self.gabor((self.ReConv.weight, self.ImConv.weight))
+        weight = (enhanced_weight, enhanced_weight[0] + enhanced_weight[1])
+        if use_cache:
+            self._weight_cache = (key, weight)
+        return weight
 
 
 class Project(nn.Module):
@@ -173,6 +277,34 @@ class Project(nn.Module):
         return x
 
 
+class NewCmplx(nn.Module):
+    """Turns a real input into a trivial complex tensor.
+
+    When gradients are disabled the output is written into a reused buffer,
+    whose imaginary half stays zero between calls so only the real half is
+    copied. The returned tensor is then overwritten by the next call. The
+    buffer is not used under torch.compile, where its checks would break the
+    graph.
+    """
+    def __init__(self):
+        super().__init__()
+        self.register_buffer("out", None, persistent=False)
+
+    def forward(self, x):
+        if torch.is_grad_enabled() or torch.compiler.is_compiling():
+            return new_cmplx(x)
+        # An inference tensor can't be written to outside inference mode,
+        # so the buffer is also replaced when switching between the two
+        if (self.out is None or self.out.size()[1:] != x.size()
+                or self.out.dtype != x.dtype
+                or self.out.device != x.device
+                or self.out.is_inference() != torch.is_inference_mode_enabled()):
+            self.out = new_cmplx(x)
+        else:
+            self.out[0].copy_(x)
+        return self.out
+
+
 class ConvCmplx(nn.Module):
     """Implements a complex convolutional layer.
 
@@ -194,12 +326,33 @@ class ConvCmplx(nn.Module):
             init_weights(self.ReConv.weight, self.ImConv.weight, weight_init)
         self.conv = conv_cmplx
         self.conv_kwargs = conv_kwargs
+        self._weight_cache = None
 
     def forward(self, x):
-        cmplx_weight = cmplx(self.ReConv.weight, self.ImConv.weight)
-        out = self.conv(x, cmplx_weight, **self.conv_kwargs)
+        cmplx_weight, weight_sum = self.cmplx_weight()
+        out = self.conv(x, cmplx_weight, w_sum=weight_sum, **self.conv_kwargs)
         return out
 
+    def cmplx_weight(self):
+        """Returns the complex weight and the sum of its components.
+
+        When gradients are disabled both are cached until the weights change.
+        """
+        use_cache = _use_weight_cache()
+        if not use_cache:
+            self._weight_cache = None
+        else:
+            key = _weight_key(self.ReConv.weight, self.ImConv.weight)
+            if self._weight_cache is not None and self._weight_cache[0] == key:
+                return self._weight_cache[1]
+        weight = (
+            (self.ReConv.weight, self.ImConv.weight),
+            self.ReConv.weight + self.ImConv.weight
+        )
+        if use_cache:
+            self._weight_cache = (key, weight)
+        return weight
+
 
 class LinearCmplx(nn.Module):
     """Implements a complex linear layer.
@@ -305,6 +458,9 @@ class ReLUCmplx(nn.Module):
 
 class BatchNormCmplx(nn.Module):
     """Implements complex batch normalisation.
+
+    The magnitude is normalised and the phase left untouched, so the real
+    and imaginary components can't be handed to a real batch norm.
     """
     def __init__(self, num_features, momentum=0.999, eps=1e-8, bnorm_type='new'):
         super().__init__()
@@ -331,14 +487,13 @@ class BatchNormCmplx(nn.Module):
         if self.bnorm_type == 'old':
             return bnorm_cmplx_old(x, self.eps)
         r = magnitude(x, eps=self.eps, sq=False)
-        batch_mean = r.mean((0, 2, 3), keepdim=True)
-        batch_var = r.var((0, 2, 3), keepdim=True)
+        batch_var, batch_mean = torch.var_mean(r, (0, 2, 3), keepdim=True)
 
         mean = (1.0 - self.momentum) * batch_mean + self.momentum * self.running_mean
         var = (1.0 - self.momentum) * batch_var + self.momentum * self.running_var
 
         r_bn = self.weight * (r - mean) / (var + self.eps) + self.bias
-        return r_bn * x / r
+        return x * (r_bn / r)
 
 
 class MaxMagPoolCmplx(nn.Module):
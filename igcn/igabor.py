@@ -74,9 +74,11 @@ def cartesian_coords(weight):
     """
     h = weight.size(-2)
     w = weight.size(-1)
-    y, x = torch.meshgrid([torch.arange(-h / 2, h / 2), torch.arange(-w / 2, w / 2)])
-    x = x.to(weight.device)
-    y = y.to(weight.device)
+    y, x = torch.meshgrid(
+        torch.arange(-h / 2, h / 2, device=weight.device),
+        torch.arange(-w / 2, w / 2, device=weight.device),
+        indexing='ij'
+    )
     return x, y
 
 
@@ -129,8 +131,10 @@ def gabor_cmplx(weight, params):
     l = params[1].unsqueeze(1).unsqueeze(1)
     x_p = x_prime(x, y, theta)
 
-    real = f * s_h(x_p, l)
-    imag = f * s_h_imag(x_p, l)
+    # Equivalent to s_h/s_h_imag, sharing the phase between both components
+    phase = 2 * math.pi / l * x_p
+    real = f * torch.cos(phase)
+    imag = f * torch.sin(phase)
 
     return norm(cmplx(real, imag)).unsqueeze(2)
 
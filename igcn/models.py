@@ -12,9 +12,10 @@ from igcn.cmplx_modules import (
     AvgPoolCmplx,
     ConvCmplx,
     LinearMagPhase,
+    NewCmplx,
     Project
 )
-from igcn.cmplx import new_cmplx, magnitude, concatenate
+from igcn.cmplx import magnitude, concatenate
 
 
 class DoubleIGConv(nn.Module):
@@ -89,6 +90,9 @@ class DoubleIGConvCmplx(nn.Module):
                 out_channels // first_div // all_gp_div,
                 out_channels // max_g_div,
                 kernel_size,
+                # Only the last block pads an extra pixel, which sets the final
+                # feature map size. Shapes stay fixed for a given model, so
+                # cudnn benchmark tunes each conv once.
                 padding=padding + int(last),
                 no_g=no_g,
                 gabor_pooling=gabor_pooling,
@@ -223,14 +227,20 @@ class IGCN(Model):
         fc_block(str, optional):
         fc_relu_type(str, optional):
         bnorm(str, optional):
+        compile (bool, optional): Whether to compile the forward pass with
+            torch.compile. Defaults to False.
+        channels_last (bool, optional): Whether to store weights and
+            activations in channels last (NHWC) format. Defaults to False.
+        amp (bool, optional): Whether to run the forward pass under bfloat16
+            autocast. Outputs are returned in float32. Defaults to False.
     """
     def __init__(self, n_classes=10, n_channels=1, base_channels=16, no_g=4,
                  kernel_size=3, inter_gp=None, final_gp=None, cmplx=False,
                  pooling='max', dropout=0.3, dset='mnist', single=False,
                  all_gp=False, relu_type='c', nfc=2, weight_init=None,
                  fc_type='cat', fc_block='linear', fc_relu_type='c',
-                 bnorm='new', softmax=False,
-                 **kwargs):
+                 bnorm='new', softmax=False, compile=False,
+                 channels_last=False, amp=False, **kwargs):
         super().__init__(**kwargs)
         self.fc_type = fc_type
         if cmplx:
@@ -329,10 +339,27 @@ class IGCN(Model):
                     nn.Linear(self.fcn, 10),
                 )
         self.cmplx = cmplx
+        if cmplx:
+            self.new_cmplx = NewCmplx()
+        self.channels_last = channels_last
+        self.amp = amp
+        if channels_last:
+            self.to(memory_format=torch.channels_last)
+        if compile:
+            self.compile()
 
     def forward(self, x):
+        if not self.amp:
+            return self._forward(x)
+        with torch.autocast(x.device.type, dtype=torch.bfloat16):
+            x = self._forward(x)
+        return x.float()
+
+    def _forward(self, x):
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
         if self.cmplx:
-            x = new_cmplx(x)
+            x = self.new_cmplx(x)
         x = self.conv1(x)
         x = self.conv2(x)
         x = self.conv3(x)
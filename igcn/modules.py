@@ -34,24 +34,19 @@ class IGabor(nn.Module):
         self.register_backward_hook(self.set_filter_calc)
 
     def forward(self, x):
-        # print(f'x.size()={x.unsqueeze(1).size()}, gabor={gabor(x, self.gabor_params).unsqueeze(1).size()}')
-        if self.calc_filters:
-            self.generate_gabor_filters(x)
-
-        # print(f'self.gabor_filters.size()={self.gabor_filters.size()}')
-
+        self.update_filters()
         out = self.gabor_filters * x.unsqueeze(1)
-
-        # print(f'out.size()={out.size()}')
-
-        out = out.view(-1 , *out.size()[2:])
-
-        # print(f'out.size()={out.size()}')
-
+        out = out.view(-1, *out.size()[2:])
         if self.layer:
             out = out.view(x.size(0), x.size(1) * self.no_g, *x.size()[2:])
         return out
 
+    def update_filters(self):
+        """Regenerates the filter bank if it is stale.
+        """
+        if self.calc_filters:
+            self.generate_gabor_filters(self.gabor_filters)
+
     def generate_gabor_filters(self, x):
         """Generates the gabor filter bank
         """
@@ -158,15 +153,11 @@ class IGBranched(Conv2d):
         self.rot_pool = rot_pool
         self.max_gabor = max_gabor
         self.conv_kwargs = conv_kwargs
-        print(f'stride={self.stride}, padding={self.padding}, dilation={self.dilation}')
 
     def forward(self, x):
         gabor_out = self.gabor(x)
-        print(gabor_out.size())
         gabor_out = gabor_out.view(x.size(0), x.size(1) * self.no_g, *x.size()[2:])
-        print(gabor_out.size())
         conv_out = self.conv(x, self.weight, **self.conv_kwargs)
-        print(x.size(), self.weight.size(), gabor_out.size(), conv_out.size())
         return torch.cat((gabor_out, conv_out), dim=1)
 
 
@@ -195,17 +186,21 @@ class IGParallel(_ConvNd):
 
     def forward(self, x):
         enhanced_weight = self.gabor(self.weight)
-        gabor_conv_out = F.conv2d(x, enhanced_weight, None, self.stride,
-                                  self.padding, self.dilation)
-        if self.max_gabor:
-            gabor_conv_out = gabor_conv_out.view(gabor_conv_out.size(0),
-                                                 enhanced_weight.size(0) // self.no_g,
-                                                 self.no_g,
-                                                 gabor_conv_out.size(2),
-                                                 gabor_conv_out.size(3))
-            gabor_conv_out, _ = torch.max(gabor_conv_out, dim=2)
-        conv_out = F.conv2d(x, self.weight, None, self.stride,
-                            self.padding, self.dilation)
+        # A single conv over both filter banks writes the two sets of
+        # activation maps straight into one tensor
+        out = F.conv2d(x, torch.cat((enhanced_weight, self.weight)), None,
+                       self.stride, self.padding, self.dilation)
+        if not self.max_gabor:
+            return out
+        gabor_conv_out, conv_out = out.split(
+            [enhanced_weight.size(0), self.weight.size(0)], dim=1
+        )
+        gabor_conv_out = gabor_conv_out.view(gabor_conv_out.size(0),
+                                             enhanced_weight.size(0) // self.no_g,
+                                             self.no_g,
+                                             gabor_conv_out.size(2),
+                                             gabor_conv_out.size(3))
+        gabor_conv_out, _ = torch.max(gabor_conv_out, dim=2)
         return torch.cat((gabor_conv_out, conv_out), dim=1)
 
 
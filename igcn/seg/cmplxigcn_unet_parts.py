@@ -1,6 +1,6 @@
 import torch.nn as nn
-from igcn.cmplx import cmplx
 from igcn.cmplx_modules import IGConvCmplx, ReLUCmplx, BatchNormCmplx, MaxPoolCmplx, AvgPoolCmplx, MaxMagPoolCmplx
+from igcn.utils import upsample_nearest_add
 
 
 class TripleIGConvCmplx(nn.Module):
@@ -79,5 +79,9 @@ class UpCmplx(nn.Module):
         self.conv = TripleIGConvCmplx(in_channels, out_channels, kernel_size, no_g=no_g, last=last, gp=gp)
 
     def forward(self, x1, x2):
-        x1 = cmplx(self.up(x1[0]), self.up(x1[1]))
+        if isinstance(self.up, nn.Upsample):
+            return self.conv(upsample_nearest_add(x1, x2))
+        # Both components are upsampled in one call with the complex axis
+        # folded into the batch
+        x1 = self.up(x1.flatten(0, 1)).unflatten(0, (2, -1))
         return self.conv(x1 + x2)
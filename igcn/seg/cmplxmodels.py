@@ -1,19 +1,23 @@
 import torch
 import torch.nn as nn
+from torch.utils.checkpoint import checkpoint
 from quicktorch.models import Model
+from igcn.cmplx_modules import IGaborCmplx, NewCmplx
 from igcn.seg.cmplxigcn_unet_parts import DownCmplx, UpCmplx, TripleIGConvCmplx
-from igcn.cmplx import new_cmplx
+from igcn.cmplx import concatenate
 
 
 class UNetIGCNCmplx(Model):
     def __init__(self, n_classes, n_channels=1, no_g=8, base_channels=16,
                  kernel_size=3, nfc=1, dropout=0., pooling='max',
-                 mode='nearest', gp='max', **kwargs):
+                 mode='nearest', gp='max', conv_checkpointing=False,
+                 channels_last=False, amp=False, compile=False, **kwargs):
         super().__init__(**kwargs)
         self.n_channels = n_channels
         self.n_classes = n_classes
         self.mode = mode
         self.kernel_size = kernel_size
+        self.conv_checkpointing = conv_checkpointing
 
         self.inc = TripleIGConvCmplx(n_channels, base_channels, kernel_size, no_g=no_g, gp=gp)
         self.down1 = DownCmplx(base_channels, base_channels * 2, kernel_size, no_g=no_g, gp=gp, pooling=pooling)
@@ -37,17 +41,49 @@ class UNetIGCNCmplx(Model):
             nn.Conv2d(base_channels * 2, n_classes, kernel_size=1)
         )
 
+        self.new_cmplx = NewCmplx()
+
+        self.channels_last = channels_last
+        self.amp = amp
+        if channels_last:
+            self.to(memory_format=torch.channels_last)
+        if compile:
+            self.compile()
+
     def forward(self, x):
-        x = new_cmplx(x)
+        if not self.amp:
+            return self.outc(self.features(x))
+        # The 1x1 head stays in float32
+        with torch.autocast(x.device.type, dtype=torch.bfloat16):
+            x = self.features(x)
+        return self.outc(x.float())
+
+    def features(self, x):
+        """Runs the U-Net up to, but not including, the 1x1 output head.
+        """
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
+        x = self.new_cmplx(x)
         x1 = self.inc(x)
-        x2 = self.down1(x1)
-        x3 = self.down2(x2)
-        x4 = self.down3(x3)
-        x5 = self.down4(x4)
-        x = self.up1(x5, x4)
-        x = self.up2(x, x3)
-        x = self.up3(x, x2)
+        x2 = self.run_block(self.down1, x1)
+        x3 = self.run_block(self.down2, x2)
+        x4 = self.run_block(self.down3, x3)
+        x5 = self.run_block(self.down4, x4)
+        x = self.run_block(self.up1, x5, x4)
+        x = self.run_block(self.up2, x, x3)
+        x = self.run_block(self.up3, x, x2)
         x = self.up4(x, x1)
-        x = torch.cat([x[0], x[1]], dim=1)
-        mask = self.outc(x)
-        return mask
+        return concatenate(x)
+
+    def run_block(self, block, *inputs):
+        """Runs a down/up block, recomputing its activations during backward
+        rather than storing them if conv_checkpointing is set.
+        """
+        if self.conv_checkpointing and torch.is_grad_enabled():
+            # Filter banks are built outside the checkpoint, otherwise the
+            # recomputation would reuse the bank rather than rebuild it
+            for module in block.modules():
+                if isinstance(module, IGaborCmplx):
+                    module.update_filters()
+            return checkpoint(block, *inputs, use_reentrant=False)
+        return block(*inputs)
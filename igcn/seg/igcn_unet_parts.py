@@ -1,5 +1,6 @@
 import torch.nn as nn
 from igcn.modules import IGConv
+from igcn.utils import upsample_nearest_add
 
 
 class TripleIGConv(nn.Module):
@@ -69,5 +70,7 @@ class Up(nn.Module):
         self.conv = TripleIGConv(in_channels, out_channels, kernel_size, no_g=no_g, last=last)
 
     def forward(self, x1, x2):
+        if isinstance(self.up, nn.Upsample):
+            return self.conv(upsample_nearest_add(x1, x2))
         x1 = self.up(x1)
         return self.conv(x1 + x2)
@@ -1,18 +1,24 @@
 import torch
 import torch.nn as nn
+from torch.utils.checkpoint import checkpoint
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
 from quicktorch.models import Model
+from igcn.modules import IGabor
 from igcn.seg.igcn_unet_parts import Down, Up, TripleIGConv
 
 
 class UNetIGCN(Model):
     def __init__(self, n_classes, n_channels=1, base_channels=16, no_g=4,
-                 kernel_size=3, mode='nearest', **kwargs):
+                 kernel_size=3, mode='nearest', conv_checkpointing=False,
+                 channels_last=False, amp=False, compile=False, **kwargs):
         super().__init__(**kwargs)
         self.n_channels = n_channels
         self.n_classes = n_classes
         self.mode = mode
         self.kernel_size = kernel_size
         self.base_channels = base_channels
+        self.conv_checkpointing = conv_checkpointing
 
         self.inc = TripleIGConv(n_channels, base_channels, kernel_size, no_g=no_g)
         self.down1 = Down(base_channels, base_channels * 2, kernel_size, no_g=no_g)
@@ -26,15 +32,77 @@ class UNetIGCN(Model):
         self.outc = nn.Conv2d(base_channels, base_channels, kernel_size=1)
         self.outc = nn.Conv2d(base_channels, n_classes, kernel_size=1)
 
+        self.channels_last = channels_last
+        self.amp = amp
+        if channels_last:
+            self.to(memory_format=torch.channels_last)
+        if compile:
+            self.compile()
+
     def forward(self, x):
+        if not self.amp:
+            return self.outc(self.features(x))
+        # The 1x1 head stays in float32
+        with torch.autocast(x.device.type, dtype=torch.bfloat16):
+            x = self.features(x)
+        return self.outc(x.float())
+
+    def features(self, x):
+        """Runs the U-Net up to, but not including, the 1x1 output head.
+        """
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
         x1 = self.inc(x)
-        x2 = self.down1(x1)
-        x3 = self.down2(x2)
-        x4 = self.down3(x3)
-        x5 = self.down4(x4)
-        x = self.up1(x5, x4)
-        x = self.up2(x, x3)
-        x = self.up3(x, x2)
+        x2 = self.run_block(self.down1, x1)
+        x3 = self.run_block(self.down2, x2)
+        x4 = self.run_block(self.down3, x3)
+        x5 = self.run_block(self.down4, x4)
+        x = self.run_block(self.up1, x5, x4)
+        x = self.run_block(self.up2, x, x3)
+        x = self.run_block(self.up3, x, x2)
         x = self.up4(x, x1)
-        mask = self.outc(x)
-        return mask
+        return x
+
+    def run_block(self, block, *inputs):
+        """Runs a down/up block, recomputing its activations during backward
+        rather than storing them if conv_checkpointing is set.
+        """
+        if self.conv_checkpointing and torch.is_grad_enabled():
+            # Filter banks are built outside the checkpoint, otherwise the
+            # recomputation would reuse the bank rather than rebuild it
+            for module in block.modules():
+                if isinstance(module, IGabor):
+                    module.update_filters()
+            return checkpoint(block, *inputs, use_reentrant=False)
+        return block(*inputs)
+
+
+def build_ddp(model, local_rank):
+    """Wraps a segmentation model for DistributedDataParallel training.
+
+    Intended to be run with one process per GPU, e.g. launched with
+    `torchrun --nproc_per_node=N`, which sets the environment used by
+    init_process_group. Loaders should then use a DistributedSampler so each
+    process sees its own shard of the data.
+
+    Some parameters never receive a gradient, e.g. the ReConv/ImConv biases
+    that conv_cmplx ignores and the weight and bias of 'old' style
+    BatchNormCmplx. The set of unused parameters is the same on every
+    iteration, and static_graph is what lets DDP handle them, as well as
+    reorder and overlap gradient buckets with backward. Dropping it would
+    need find_unused_parameters=True instead.
+
+    Args:
+        model (torch.nn.Module): Model to wrap.
+        local_rank (int): Index of the GPU owned by this process.
+    """
+    if not dist.is_initialized():
+        dist.init_process_group(backend='nccl')
+    torch.cuda.set_device(local_rank)
+    return DistributedDataParallel(
+        model.to(torch.device('cuda', local_rank)),
+        device_ids=[local_rank],
+        bucket_cap_mb=25,
+        gradient_as_bucket_view=True,
+        static_graph=True
+    )
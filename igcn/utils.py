@@ -5,3 +5,15 @@ def _pair(x):
     if type(x) is int:
         return (x, x)
     return x
+
+
+def upsample_nearest_add(x, skip):
+    """Computes 2x nearest upsampling of x added to skip in a single op.
+
+    Each pixel of x is broadcast over a 2x2 block of skip, so the upsampled
+    tensor is never materialised. Works for any number of leading dims, e.g.
+    complex tensors.
+    """
+    h, w = x.size(-2), x.size(-1)
+    out = skip.unflatten(-1, (w, 2)).unflatten(-3, (h, 2)) + x[..., None, :, None]
+    return out.flatten(-2).flatten(-3, -2)
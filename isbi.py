@@ -12,46 +12,47 @@ from igcn.seg.models import UNetIGCN
 from igcn.seg.cmplxmodels import UNetIGCNCmplx
 from quicktorch.utils import train, imshow
 from data import EMDataset, post_em_data
+from utils import loader_kwargs
 
 
-def get_train_data(batch_size=8):
+def get_train_data(batch_size=8, num_workers=4):
     train_idxs = list(range(30))
     valid_idxs = [train_idxs.pop(random.randint(0, 29))]
     print(valid_idxs)
+    # Both splits share the same augmentation
+    transform = albumentations.Compose([
+        albumentations.RandomCrop(256, 256),
+        albumentations.Flip(),
+        albumentations.RandomRotate90(),
+        albumentations.ElasticTransform(),
+        albumentations.PadIfNeeded(288, 288)
+    ])
     trainloader = DataLoader(
         EMDataset(
             'data/isbi/train',
-            albumentations.Compose([
-                albumentations.RandomCrop(256, 256),
-                albumentations.Flip(),
-                albumentations.RandomRotate90(),
-                albumentations.ElasticTransform(),
-                albumentations.PadIfNeeded(288, 288)
-            ]),
-            indices=train_idxs
+            transform,
+            indices=train_idxs,
+            cache=True
         ),
         batch_size=batch_size,
-        shuffle=True
+        shuffle=True,
+        **loader_kwargs(num_workers)
     )
     validloader = DataLoader(
         EMDataset(
             'data/isbi/train',
-            albumentations.Compose([
-                albumentations.RandomCrop(256, 256),
-                albumentations.Flip(),
-                albumentations.RandomRotate90(),
-                albumentations.ElasticTransform(),
-                albumentations.PadIfNeeded(288, 288)
-            ]),
-            indices=valid_idxs
+            transform,
+            indices=valid_idxs,
+            cache=True
         ),
         batch_size=batch_size,
-        shuffle=True
+        shuffle=True,
+        **loader_kwargs(num_workers)
     )
     return trainloader, validloader
 
 
-def get_test_data(batch_size=8):
+def get_test_data(batch_size=8, num_workers=4):
     return DataLoader(
         EMDataset(
             'data/isbi/test',
@@ -60,7 +61,8 @@ def get_test_data(batch_size=8):
             ]),
             aug_mult=1,
         ),
-        batch_size=batch_size
+        batch_size=batch_size,
+        **loader_kwargs(num_workers)
     )
 
 
@@ -164,11 +166,18 @@ def main():
     parser.add_argument('--batch_size',
                         default=8, type=int,
                         help='Number of samples in each batch.')
+    parser.add_argument('--num_workers',
+                        default=4, type=int,
+                        help='Number of DataLoader worker processes.')
     parser.add_argument('--splits',
                         default=1, type=int,
                         help='Number of validation splits to train over')
     args = parser.parse_args()
 
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+
     device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
     if args.produce:
         if args.path is None:
@@ -177,7 +186,8 @@ def main():
     else:
         metrics = []
         for i in range(args.splits):
-            train_data, valid_data = get_train_data(batch_size=args.batch_size)
+            train_data, valid_data = get_train_data(batch_size=args.batch_size,
+                                                    num_workers=args.num_workers)
 
             if args.cmplx:
                 Net = UNetIGCNCmplx
@@ -214,7 +224,6 @@ def main():
             mins = int(time_taken // 60)
             secs = int(time_taken % 60)
             del(model)
-            torch.cuda.empty_cache()
             metrics.append(m)
 
             if args.produce:
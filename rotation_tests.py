@@ -108,7 +108,7 @@ def main():
                         help='Type of test to run. (default: %(default)s)')
 
     net_args, training_args = parser.parse_group_args()
-    args = parser.parse_args()
+    args = parser.args
 
     model = get_model()
 
@@ -1,23 +1,22 @@
+import math
 import os
 import torch
 import torch.optim as optim
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from torch.utils.data import DataLoader
 from igcn.seg.cmplxmodels import UNetIGCNCmplx
 from quicktorch.utils import train, evaluate, imshow, get_splits
 from data import CirrusDataset
-from utils import ExperimentParser, calculate_error
+from utils import ExperimentParser, CUDAPrefetcher, calculate_error, loader_kwargs
 from unet import UNetCmplx
 from labscribe import upload_results
 
 
 def write_results(**kwargs):
-    sorted_keys = sorted([key for key in kwargs.keys()])
-    result = '\n' + '\t'.join([str(kwargs[key]) for key in sorted_keys])
+    result = '\n' + '\t'.join(str(kwargs[key]) for key in sorted(kwargs))
 
-    f = open("cirrus_results.txt", "a+")
-    f.write(result)
-    f.close()
+    with open("cirrus_results.txt", "a") as f:
+        f.write(result)
 
 
 def main():
@@ -33,12 +32,23 @@ def main():
                         help='Attempts to denoise the image')
 
     net_args, training_args = parser.parse_group_args()
-    args = parser.parse_args()
+    args = parser.args
     data_dir = args.dir
+    # normpath drops any trailing separator, which would leave an empty name
+    dataset = os.path.basename(os.path.normpath(data_dir))
+
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
 
     device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
 
     metrics = []
+    # Means and the best split are accumulated as each split finishes
+    master_key = 'PSNR' if args.denoise else 'IoU'
+    metric_sums = defaultdict(float)
+    best_acc = -math.inf
+    best_split = 1
     if training_args.nsplits == 1:
         splits = [[None, None]]
     else:
@@ -46,21 +56,27 @@ def main():
     for split_no, split in zip(range(training_args.nsplits), splits):
         print('Beginning split #{}/{}'.format(split_no + 1, training_args.nsplits))
         print(data_dir)
-        train_loader = DataLoader(CirrusDataset(os.path.join(data_dir, 'train'), indices=split[0], denoise=args.denoise),
-                                  batch_size=4, shuffle=True)
-        val_loader = DataLoader(CirrusDataset(os.path.join(data_dir, 'train'), indices=split[1], denoise=args.denoise),
-                                batch_size=4, shuffle=True)
+        dl_kwargs = loader_kwargs(training_args.num_workers)
+        train_loader = DataLoader(CirrusDataset(os.path.join(data_dir, 'train'), indices=split[0], denoise=args.denoise, cache=True),
+                                  batch_size=4, shuffle=True, **dl_kwargs)
+        val_loader = DataLoader(CirrusDataset(os.path.join(data_dir, 'train'), indices=split[1], denoise=args.denoise, cache=True),
+                                batch_size=4, shuffle=True, **dl_kwargs)
         test_loader = DataLoader(CirrusDataset(os.path.join(data_dir, 'test'), denoise=args.denoise),
-                                 batch_size=4, shuffle=True)
+                                 batch_size=4, shuffle=True, **dl_kwargs)
+        if device.type == 'cuda':
+            train_loader = CUDAPrefetcher(train_loader, device)
+            val_loader = CUDAPrefetcher(val_loader, device)
 
-        dataset = os.path.split(args.dir)[-1]
         if args.standard:
             model = UNetCmplx(
                 name=f'cnn_dataset={dataset}_denoise={args.denoise}',
                 n_channels=1,
                 base_channels=5,
                 n_classes=1,
-                pooling=args.pooling
+                pooling=args.pooling,
+                channels_last=training_args.channels_last,
+                amp=training_args.amp,
+                compile=training_args.compile
             ).to(device)
         else:
             model = UNetIGCNCmplx(
@@ -70,7 +86,10 @@ def main():
                 no_g=8,
                 n_classes=1,
                 gp=None,
-                pooling=args.pooling
+                pooling=args.pooling,
+                channels_last=training_args.channels_last,
+                amp=training_args.amp,
+                compile=training_args.compile
             ).to(device)
 
         total_params = sum(p.numel()
@@ -90,13 +109,14 @@ def main():
         m = evaluate(model, test_loader, device=device)
         model_name = model.name
         del(model)
-        torch.cuda.empty_cache()
         metrics.append(m)
+        for key, val in m.items():
+            metric_sums[key] += val
+        if m[master_key] > best_acc:
+            best_acc = m[master_key]
+            best_split = split_no + 1
 
-    mean_m = {f'{key}_mean': sum(mi[key] for mi in metrics) / training_args.nsplits for key in m.keys()}
-    master_key = 'PSNR' if args.denoise else 'IoU'
-    best_acc = max([mi[master_key] for mi in metrics])
-    best_split = [mi[master_key] for mi in metrics].index(best_acc) + 1
+    mean_m = {f'{key}_mean': total / training_args.nsplits for key, total in metric_sums.items()}
     best_split_metrics = metrics[best_split-1]
     error_m = {f'{key}_error': calculate_error([mi[key] for mi in metrics])
                for key in m.keys()}
@@ -0,0 +1,52 @@
+import os
+import numpy as np
+import PIL.Image as Image
+import torch
+from data import CirrusDataset, EMDataset
+
+
+def write_pngs(img_dir, names, n=2, size=16):
+    rng = np.random.default_rng(0)
+    for name in names:
+        os.makedirs(os.path.join(img_dir, name))
+        for i in range(n):
+            arr = rng.integers(0, 256, (size, size), dtype=np.uint8)
+            Image.fromarray(arr).save(os.path.join(img_dir, name, f'{i:05d}.png'))
+
+
+def crop_and_zero(image, mask):
+    """Crops to a view of the input, then writes to it in place."""
+    image, mask = image[:8, :8], mask[:8, :8]
+    image[:4] = 0
+    mask[:4] = 0
+    return {'image': image, 'mask': mask}
+
+
+def test_em_cache_survives_inplace_transform(tmp_path):
+    write_pngs(tmp_path, ['volume', 'labels'])
+    cached = EMDataset(str(tmp_path), transform=crop_and_zero, aug_mult=1, cache=True)
+    uncached = EMDataset(str(tmp_path), transform=crop_and_zero, aug_mult=1)
+    first = cached[0]
+    second = cached[0]
+    expected = uncached[0]
+    for a, b, c in zip(first, second, expected):
+        assert torch.equal(a, b)
+        assert torch.equal(a, c)
+    em, mask = cached.cache[0]
+    assert np.array_equal(em, np.array(Image.open(cached.em_paths[0])))
+    assert np.array_equal(mask, np.array(Image.open(cached.mask_paths[0])))
+
+
+def test_cirrus_cache_matches_uncached(tmp_path):
+    write_pngs(tmp_path, ['input', 'target'])
+    cached = CirrusDataset(str(tmp_path), cache=True,
+                           transform=lambda t: t.mul_(2))
+    uncached = CirrusDataset(str(tmp_path),
+                             transform=lambda t: t.mul_(2))
+    for i in range(len(cached)):
+        first = cached[i]
+        second = cached[i]
+        expected = uncached[i]
+        for a, b, c in zip(first, second, expected):
+            assert torch.equal(a, b)
+            assert torch.equal(a, c)
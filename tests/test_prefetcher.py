@@ -0,0 +1,29 @@
+import pytest
+import torch
+from torch.utils._pytree import tree_flatten
+from utils import CUDAPrefetcher
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason='needs CUDA')
+@pytest.mark.parametrize('batch', [
+    (torch.arange(6.).view(2, 3), torch.tensor([0, 1])),
+    [torch.arange(6.).view(2, 3), torch.tensor([0, 1])],
+    {'image': torch.arange(6.).view(2, 3), 'label': torch.tensor([0, 1]),
+     'name': 'a'},
+    torch.arange(6.).view(2, 3),
+])
+def test_batch_type_and_values_survive(batch):
+    loader = [batch, batch]
+    out = list(CUDAPrefetcher(loader, torch.device('cuda')))
+    assert len(out) == len(loader)
+    leaves, spec = tree_flatten(batch)
+    for got in out:
+        assert type(got) is type(batch)
+        got_leaves, got_spec = tree_flatten(got)
+        assert got_spec == spec
+        for g, b in zip(got_leaves, leaves):
+            if torch.is_tensor(b):
+                assert g.is_cuda
+                assert torch.equal(g.cpu(), b)
+            else:
+                assert g == b
@@ -2,13 +2,15 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from quicktorch.models import Model
-from igcn.cmplx import new_cmplx, cmplx
-from igcn.cmplx_modules import ConvCmplx, ReLUCmplx, BatchNormCmplx, MaxPoolCmplx, AvgPoolCmplx
+from igcn.cmplx import concatenate
+from igcn.cmplx_modules import NewCmplx, ConvCmplx, ReLUCmplx, BatchNormCmplx, MaxPoolCmplx, AvgPoolCmplx
+from igcn.utils import upsample_nearest_add
 
 
 class UNetCmplx(Model):
     def __init__(self, n_classes, n_channels=1, base_channels=16,
-                 kernel_size=3, nfc=1, dropout=0., pooling='max', mode='nearest', **kwargs):
+                 kernel_size=3, nfc=1, dropout=0., pooling='max', mode='nearest',
+                 channels_last=False, amp=False, compile=False, **kwargs):
         super().__init__(**kwargs)
         self.n_channels = n_channels
         self.n_classes = n_classes
@@ -36,9 +38,29 @@ class UNetCmplx(Model):
             *linear_blocks,
             nn.Conv2d(base_channels * 2, n_classes, kernel_size=1)
         )
+        self.new_cmplx = NewCmplx()
+
+        self.channels_last = channels_last
+        self.amp = amp
+        if channels_last:
+            self.to(memory_format=torch.channels_last)
+        if compile:
+            self.compile()
 
     def forward(self, x):
-        x = new_cmplx(x)
+        if not self.amp:
+            return self.outc(self.features(x))
+        # The 1x1 head stays in float32
+        with torch.autocast(x.device.type, dtype=torch.bfloat16):
+            x = self.features(x)
+        return self.outc(x.float())
+
+    def features(self, x):
+        """Runs the U-Net up to, but not including, the 1x1 output head.
+        """
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
+        x = self.new_cmplx(x)
         x1 = self.inc(x)
         x2 = self.down1(x1)
         x3 = self.down2(x2)
@@ -48,9 +70,7 @@ class UNetCmplx(Model):
         x = self.up2(x, x3)
         x = self.up3(x, x2)
         x = self.up4(x, x1)
-        x = torch.cat([x[0], x[1]], dim=1)
-        mask = self.outc(x)
-        return mask
+        return concatenate(x)
 
 
 class TripleConvCmplx(nn.Module):
@@ -125,5 +145,9 @@ class UpCmplx(nn.Module):
         self.conv = TripleConvCmplx(in_channels, out_channels, kernel_size)
 
     def forward(self, x1, x2):
-        x1 = cmplx(self.up(x1[0]), self.up(x1[1]))
+        if isinstance(self.up, nn.Upsample):
+            return self.conv(upsample_nearest_add(x1, x2))
+        # Both components are upsampled in one call with the complex axis
+        # folded into the batch
+        x1 = self.up(x1.flatten(0, 1)).unflatten(0, (2, -1))
         return self.conv(x1 + x2)
@@ -1,7 +1,9 @@
 import argparse
 import math
 import numpy as np
+import torch
 import PIL.Image as Image
+from torch.utils._pytree import tree_leaves, tree_map
 
 
 def parse_none(x):
@@ -13,9 +15,13 @@ class ExperimentParser(argparse.ArgumentParser):
 
     Arguments are divided into network and training arguments. This is just a
     LITTLE bit hacky :)
+
+    The full namespace from parse_group_args is kept in self.args so scripts
+    needn't parse the command line a second time.
     """
     def __init__(self, description=''):
         super().__init__(description=description)
+        self.args = None
         self.n_parser = self.add_argument_group('net')
         self.t_parser = self.add_argument_group('training')
         self.construct_parsers()
@@ -146,6 +152,22 @@ class ExperimentParser(argparse.ArgumentParser):
             '--batch_size',
             default=32, type=int,
             help='Number of samples in each batch')
+        self.t_parser.add_argument(
+            '--amp',
+            default=False, action='store_true',
+            help='Whether to run the model under bfloat16 autocast.')
+        self.t_parser.add_argument(
+            '--channels_last',
+            default=False, action='store_true',
+            help='Whether to use channels last memory format for convolutions.')
+        self.t_parser.add_argument(
+            '--compile',
+            default=False, action='store_true',
+            help='Whether to compile the model with torch.compile.')
+        self.t_parser.add_argument(
+            '--num_workers',
+            default=4, type=int,
+            help='Number of DataLoader worker processes.')
         self.t_parser.add_argument(
             '--translate',
             default=0, type=float,
@@ -165,11 +187,12 @@ class ExperimentParser(argparse.ArgumentParser):
             help='Name to save model under.')
 
     def parse_group_args(self):
-        args = self.parse_args()
+        if self.args is None:
+            self.args = self.parse_args()
         arg_groups = {}
 
         for group in self._action_groups:
-            group_dict = {a.dest: getattr(args, a.dest, None) for a in group._group_actions}
+            group_dict = {a.dest: getattr(self.args, a.dest, None) for a in group._group_actions}
             arg_groups[group.title] = argparse.Namespace(**group_dict)
 
         return arg_groups['net'], arg_groups['training']
@@ -191,6 +214,76 @@ class AlbumentationsWrapper():
         return Image.fromarray(out['image'])
 
 
+def loader_kwargs(num_workers=4):
+    """DataLoader options for feeding a model on the GPU.
+
+    Batches are collated into pinned memory so host to device copies can be
+    asynchronous, and workers are kept alive between epochs rather than
+    respawned for every pass over the data.
+    """
+    kwargs = {
+        'num_workers': num_workers,
+        'pin_memory': torch.cuda.is_available(),
+    }
+    if num_workers > 0:
+        kwargs['persistent_workers'] = True
+        kwargs['prefetch_factor'] = 2
+    return kwargs
+
+
+class CUDAPrefetcher():
+    """Wraps a DataLoader so each batch is copied to the GPU on a side stream
+    while the previous batch is being processed.
+
+    The loader should use pinned memory for the copies to be asynchronous.
+    Any other attribute access is passed through to the wrapped loader.
+    """
+    def __init__(self, loader, device):
+        self.loader = loader
+        self.device = device
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __getattr__(self, name):
+        if name == 'loader':
+            raise AttributeError(name)
+        return getattr(self.loader, name)
+
+    def __iter__(self):
+        stream = torch.cuda.Stream(self.device)
+        batches = iter(self.loader)
+        try:
+            next_batch = self.preload(next(batches), stream)
+        except StopIteration:
+            return
+        for batch in batches:
+            current = self.wait(next_batch, stream)
+            next_batch = self.preload(batch, stream)
+            yield current
+        yield self.wait(next_batch, stream)
+
+    def preload(self, batch, stream):
+        def to_device(t):
+            if torch.is_tensor(t):
+                return t.to(self.device, non_blocking=True)
+            return t
+
+        # tree_map keeps the batch's own containers (tuples, dicts, ...)
+        with torch.cuda.stream(stream):
+            return tree_map(to_device, batch)
+
+    def wait(self, batch, stream):
+        current = torch.cuda.current_stream(self.device)
+        current.wait_stream(stream)
+        for t in tree_leaves(batch):
+            if torch.is_tensor(t):
+                # Stops the allocator reusing the memory while the compute
+                # stream still needs it
+                t.record_stream(current)
+        return batch
+
+
 def calculate_error(items):
     N = len(items)
     if N <= 1: